@@ -1,32 +1,66 @@
-import json
 import os
 
+# orjson parses/serializes in C; fall back to the stdlib when it isn't installed
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(config):
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2)
+except ImportError:
+    import json
+
+    _loads = json.loads
+    # Built once; JSONEncoder.encode keeps no per-call state, so it is thread-safe
+    _ENCODE = json.JSONEncoder(indent=4, separators=(",", ": ")).encode
+
+    def _dumps(config):
+        return _ENCODE(config).encode("utf-8")
+
 CONFIG_PATH = "app/data/config.json"
 
+# Parsed config and the mtime it was read at; reloaded only when the file changes
+_CONFIG_CACHE = None
+_CONFIG_MTIME = None
+
 def load_config():
-    if not os.path.exists(CONFIG_PATH):
+    global _CONFIG_CACHE, _CONFIG_MTIME
+    try:
+        stat = os.stat(CONFIG_PATH)
+    except FileNotFoundError:
         return {"grid_size": 4}
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
+    if _CONFIG_MTIME == stat.st_mtime_ns:
+        return _CONFIG_CACHE
+    with open(CONFIG_PATH, "rb") as f:
+        _CONFIG_CACHE = _loads(f.read())
+    _CONFIG_MTIME = stat.st_mtime_ns
+    return _CONFIG_CACHE
 
 def save_config(config):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f, indent=4)
+    global _CONFIG_CACHE, _CONFIG_MTIME
+    with open(CONFIG_PATH, "wb") as f:
+        f.write(_dumps(config))
+    _CONFIG_CACHE = config
+    _CONFIG_MTIME = os.stat(CONFIG_PATH).st_mtime_ns
+
+def update_config(**updates):
+    # Apply several settings with a single load and a single write. Work on a copy:
+    # the cached dict is shared with every reader and must not change unless the write succeeds
+    config = dict(load_config())
+    config.update(updates)
+    save_config(config)
 
 def get_grid_size():
     config = load_config()
     return config.get("grid_size", 4)
 
 def set_grid_size(size):
-    config = load_config()
-    config["grid_size"] = size
-    save_config(config)
+    update_config(grid_size=size)
 
 def get_countdown_time():
     config = load_config()
     return config.get("countdown_time", 3)
 
 def set_countdown_time(seconds):
-    config = load_config()
-    config["countdown_time"] = seconds
-    save_config(config)
+    update_config(countdown_time=seconds)
@@ -3,47 +3,302 @@ Database operations for the eHealth Puzzle Game
 """
 import sqlite3
 import os
-from datetime import datetime
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 
 DATABASE_FILE = "app/db/game.db"
 
+logger = logging.getLogger(__name__)
 
-def init_db():
-    """Initialize the SQLite database with required tables."""
-    # Ensure the database directory exists
-    db_dir = Path(DATABASE_FILE).parent
-    db_dir.mkdir(parents=True, exist_ok=True)
-
-    connection = sqlite3.connect(DATABASE_FILE)
-    cursor = connection.cursor()
-
-    # Create players table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS players (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_id TEXT UNIQUE NOT NULL,
-            username TEXT UNIQUE NOT NULL,
-            total_score INTEGER DEFAULT 0
+# Set once init_db() has created the schema in this process
+_DB_INITIALIZED = False
+_init_lock = threading.Lock()
+
+
+class _Connection(sqlite3.Connection):
+    """
+    Connection that keeps one long-lived cursor per SQL statement, so each
+    statement is compiled once and then re-bound on every call.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statement_cursors: Dict[str, sqlite3.Cursor] = {}
+
+    def run(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        """Execute sql on its dedicated cursor and return that cursor."""
+        cursor = self._statement_cursors.get(sql)
+        if cursor is None:
+            cursor = self._statement_cursors[sql] = self.cursor()
+        return cursor.execute(sql, parameters)
+
+
+# One long-lived connection per thread instead of connect/close on every call
+_tls = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+
+# Small pool of read-only connections for SELECT-only functions; under WAL they
+# never wait on the writer connection above
+_RO_POOL_SIZE = 4
+_ro_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=_RO_POOL_SIZE)
+
+# Applied to every new connection: WAL lets readers run alongside the writer,
+# and NORMAL sync is durable enough under WAL without an fsync per commit
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA foreign_keys=ON",
+)
+
+# SQL statements live in module constants so every call hands sqlite3 the same
+# string and hits its per-connection prepared-statement cache
+_SQL_INSERT_PLAYER = """
+    INSERT INTO players (player_id, username)
+    VALUES (?, ?)
+"""
+
+# timestamp is bound as unix-epoch seconds (a float, so the winner tie-break keeps
+# sub-second order); one numeric bind, no per-insert string formatting
+_SQL_INSERT_SCORE = """
+    INSERT INTO scores (player_id, level, score, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Older databases hold text timestamps: local-time ISO strings written by
+# datetime.now().isoformat() (with a 'T'), or UTC 'YYYY-MM-DD HH:MM:SS' from the
+# column default. Converts both to unix-epoch seconds so they compare with new rows.
+_SQL_NORMALIZE_TIMESTAMPS = """
+    UPDATE scores
+    SET timestamp = (
+        julianday(timestamp, CASE WHEN instr(timestamp, 'T') THEN 'utc' ELSE '+0 days' END)
+        - 2440587.5
+    ) * 86400.0
+    WHERE typeof(timestamp) = 'text'
+"""
+
+# Bumped whenever init_db gains a one-off data migration
+_SCHEMA_VERSION = 2
+
+# Requires SQLite >= 3.35 for RETURNING
+_SQL_ADD_TO_TOTAL = """
+    UPDATE players
+    SET total_score = total_score + ?
+    WHERE player_id = ?
+    RETURNING total_score
+"""
+
+_SQL_ADD_TO_TOTAL_BULK = """
+    UPDATE players
+    SET total_score = total_score + ?
+    WHERE player_id = ?
+"""
+
+# Recomputes every cached total from the scores table
+_SQL_RECONCILE_TOTALS = """
+    UPDATE players
+    SET total_score = (
+        SELECT COALESCE(SUM(score), 0)
+        FROM scores
+        WHERE scores.player_id = players.player_id
+    )
+"""
+
+_SQL_SELECT_MAX_SCORE = "SELECT MAX(total_score) FROM players"
+
+# Only players holding the top score are joined against scores for the tie-break times
+_SQL_SELECT_WINNERS = """
+    SELECT p.username, p.player_id, p.total_score,
+           strftime('%Y-%m-%dT%H:%M:%f', MIN(s.timestamp), 'unixepoch', 'localtime') as start_time,
+           strftime('%Y-%m-%dT%H:%M:%f', MAX(s.timestamp), 'unixepoch', 'localtime') as end_time
+    FROM players p
+    LEFT JOIN scores s ON p.player_id = s.player_id
+    WHERE p.total_score = (SELECT MAX(total_score) FROM players)
+    GROUP BY p.player_id
+    ORDER BY MAX(s.timestamp) ASC
+    LIMIT 10
+"""
+
+_SQL_SELECT_PLAYER = """
+    SELECT player_id, username, total_score
+    FROM players
+    WHERE username = ?
+"""
+
+# Game levels in play order
+_ALL_LEVELS = ("level_1", "level_2", "level_3", "level_4")
+
+# get_player_progress results per player_id; dropped whenever that player scores
+_progress_cache: Dict[str, Dict] = {}
+# Bumped on every invalidation, so a read that overlapped a save doesn't cache its stale result
+_progress_generation: Dict[str, int] = {}
+_progress_lock = threading.Lock()
+
+_SQL_SELECT_LEVELS = """
+    SELECT DISTINCT level
+    FROM scores
+    WHERE player_id = ?
+"""
+
+
+def _invalidate_progress(player_ids):
+    """Drop cached progress for the given players after their scores change."""
+    with _progress_lock:
+        for player_id in player_ids:
+            _progress_cache.pop(player_id, None)
+            _progress_generation[player_id] = _progress_generation.get(player_id, 0) + 1
+
+
+def _get_conn() -> _Connection:
+    """Return this thread's database connection, opening it on first use."""
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            DATABASE_FILE, check_same_thread=False, cached_statements=256, factory=_Connection
         )
-    """)
-
-    # Create scores table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_id TEXT NOT NULL,
-            level TEXT NOT NULL,
-            score INTEGER NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (player_id) REFERENCES players(player_id)
+        conn.row_factory = sqlite3.Row
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        _tls.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+@contextmanager
+def _read_conn():
+    """Borrow a read-only connection from the pool, opening one if none is free."""
+    try:
+        conn = _ro_pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(
+            f"file:{DATABASE_FILE}?mode=ro", uri=True, check_same_thread=False, cached_statements=256,
+            factory=_Connection
         )
-    """)
+        conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        try:
+            _ro_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+@atexit.register
+def _close_connections():
+    """Let SQLite refresh its planner statistics, then close every connection."""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
+        _connections.clear()
+
+    while True:
+        try:
+            _ro_pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+
+def init_db():
+    """
+    Initialize the SQLite database with required tables.
+    Only the first call per process does any work; later calls return immediately.
+    """
+    global _DB_INITIALIZED
+    if _DB_INITIALIZED:
+        return
 
-    connection.commit()
-    connection.close()
-    print("Database initialized successfully.")
+    with _init_lock:
+        if _DB_INITIALIZED:
+            return
+
+        # Ensure the database directory exists
+        db_dir = Path(DATABASE_FILE).parent
+        db_dir.mkdir(parents=True, exist_ok=True)
+
+        connection = _get_conn()
+        cursor = connection.cursor()
+
+        # Create players table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS players (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_id TEXT UNIQUE NOT NULL,
+                username TEXT UNIQUE NOT NULL,
+                total_score INTEGER DEFAULT 0
+            )
+        """)
+
+        # Create scores table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_id TEXT NOT NULL,
+                level TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                timestamp REAL NOT NULL,
+                FOREIGN KEY (player_id) REFERENCES players(player_id)
+            )
+        """)
+
+        # Indexes for per-player score lookups and the leaderboard ordering.
+        # players.username and players.player_id are UNIQUE, so they are already indexed.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_scores_player_level
+            ON scores(player_id, level)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_players_total
+            ON players(total_score DESC)
+        """)
+
+        connection.commit()
+
+        # Refresh planner statistics so the new indexes are picked up
+        cursor.execute("ANALYZE")
+
+        # Existing databases: convert text timestamps once
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            with connection:
+                connection.run(_SQL_NORMALIZE_TIMESTAMPS)
+            cursor.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+
+        reconcile_total_scores()
+        _DB_INITIALIZED = True
+        logger.debug("Database initialized successfully.")
+
+
+def reconcile_total_scores() -> Tuple[bool, Optional[str]]:
+    """
+    Rebuild players.total_score from the scores table.
+    save_score maintains the total incrementally; this corrects any drift and
+    runs at startup, off the request path.
+    Returns (success, error_message)
+    """
+    try:
+        connection = _get_conn()
+
+        with connection:
+            connection.run(_SQL_RECONCILE_TOTALS)
+
+        return True, None
+
+    except Exception as e:
+        return False, str(e)
 
 
 def register_player(player_id: str, username: str) -> Tuple[bool, Optional[str]]:
@@ -52,25 +307,19 @@ def register_player(player_id: str, username: str) -> Tuple[bool, Optional[str]]
     Returns (success, error_message)
     """
     try:
-        connection = sqlite3.connect(DATABASE_FILE)
-        cursor = connection.cursor()
+        connection = _get_conn()
 
-        # Check if username already exists
-        cursor.execute("SELECT * FROM players WHERE username = ?", (username,))
-        if cursor.fetchone():
-            connection.close()
-            return False, "Username already exists"
-
-        # Insert new player
-        cursor.execute("""
-            INSERT INTO players (player_id, username)
-            VALUES (?, ?)
-        """, (player_id, username))
+        # Insert new player; the UNIQUE index on username rejects duplicates
+        with connection:
+            connection.run(_SQL_INSERT_PLAYER, (player_id, username))
 
-        connection.commit()
-        connection.close()
         return True, None
 
+    except sqlite3.IntegrityError as e:
+        if "players.username" in str(e):
+            return False, "Username already exists"
+        return False, str(e)
+
     except Exception as e:
         return False, str(e)
 
@@ -81,33 +330,18 @@ def save_score(player_id: str, level: str, weighted_score: int) -> Tuple[bool, O
     Returns (success, total_score, error_message)
     """
     try:
-        connection = sqlite3.connect(DATABASE_FILE)
-        cursor = connection.cursor()
-
-        # Insert the level score
-        cursor.execute("""
-            INSERT INTO scores (player_id, level, score, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (player_id, level, int(weighted_score), datetime.now().isoformat()))
+        connection = _get_conn()
 
-        # Update total_score in players table
-        cursor.execute("""
-            UPDATE players
-            SET total_score = (
-                SELECT SUM(score)
-                FROM scores
-                WHERE player_id = ?
-            )
-            WHERE player_id = ?
-        """, (player_id, player_id))
+        with connection:
+            # Insert the level score
+            connection.run(_SQL_INSERT_SCORE, (player_id, level, int(weighted_score), time.time()))
 
-        # Get updated total score
-        cursor.execute("SELECT total_score FROM players WHERE player_id = ?", (player_id,))
-        result = cursor.fetchone()
-        total_score = result[0] if result else 0
+            # Add to total_score in players table and read back the new total
+            cursor = connection.run(_SQL_ADD_TO_TOTAL, (int(weighted_score), player_id))
+            result = cursor.fetchone()
+            total_score = result[0] if result else 0
 
-        connection.commit()
-        connection.close()
+        _invalidate_progress((player_id,))
 
         return True, total_score, None
 
@@ -115,86 +349,80 @@ def save_score(player_id: str, level: str, weighted_score: int) -> Tuple[bool, O
         return False, None, str(e)
 
 
-def get_winners() -> List[Dict]:
+def save_scores_bulk(rows: List[Tuple[str, str, int]]) -> Tuple[bool, Optional[str]]:
     """
-    Get the player(s) with the highest total score.
-    Returns list of winner dictionaries.
+    Save several (player_id, level, weighted_score) rows in a single transaction.
+    Returns (success, error_message)
     """
     try:
-        connection = sqlite3.connect(DATABASE_FILE)
-        cursor = connection.cursor()
+        connection = _get_conn()
+        timestamp = time.time()
+
+        # Sum the deltas so each player's total is updated once
+        totals: Dict[str, int] = {}
+        for player_id, _, weighted_score in rows:
+            totals[player_id] = totals.get(player_id, 0) + int(weighted_score)
+
+        with connection:
+            connection.executemany(
+                _SQL_INSERT_SCORE,
+                [(player_id, level, int(weighted_score), timestamp) for player_id, level, weighted_score in rows]
+            )
+            connection.executemany(
+                _SQL_ADD_TO_TOTAL_BULK,
+                [(delta, player_id) for player_id, delta in totals.items()]
+            )
 
-        cursor.execute("""
-            SELECT p.username, p.player_id, p.total_score,
-                   MIN(s.timestamp) as start_time,
-                   MAX(s.timestamp) as end_time
-            FROM players p
-            LEFT JOIN scores s ON p.player_id = s.player_id
-            GROUP BY p.player_id
-            ORDER BY p.total_score DESC, end_time ASC
-            LIMIT 10
-        """)
+        _invalidate_progress(totals)
 
-        winners_data = cursor.fetchall()
-        connection.close()
+        return True, None
 
-        if not winners_data:
-            return []
+    except Exception as e:
+        return False, str(e)
 
-        max_score = winners_data[0][2] if winners_data else 0
-        winners = []
 
-        for row in winners_data:
-            if row[2] == max_score:
-                winners.append({
-                    "username": row[0],
-                    "player_id": row[1],
-                    "total_score": row[2],
-                    "start_time": row[3],
-                    "end_time": row[4]
-                })
+def get_winners() -> List[Dict]:
+    """
+    Get the player(s) with the highest total score.
+    Returns list of winner dictionaries.
+    """
+    try:
+        with _read_conn() as connection:
+            cursor = connection.run(_SQL_SELECT_WINNERS)
 
-        return winners
+            return [dict(row) for row in cursor]
 
     except Exception as e:
-        print(f"Error getting winners: {e}")
+        logger.exception("Error getting winners: %s", e)
         return []
 
 
 def get_max_score() -> int:
     """Get the current maximum score."""
-    winners = get_winners()
-    return winners[0]["total_score"] if winners else 0
+    try:
+        with _read_conn() as connection:
+            cursor = connection.run(_SQL_SELECT_MAX_SCORE)
+            result = cursor.fetchone()
+            return result[0] or 0
+
+    except Exception as e:
+        logger.exception("Error getting max score: %s", e)
+        return 0
 
 
-def get_player_by_username(username: str) -> Optional[Dict]:
+def get_player_by_username(username: str) -> Optional[sqlite3.Row]:
     """
     Get player information by username.
-    Returns player dict or None if not found.
+    Returns a row with player_id, username and total_score, or None if not found.
     """
     try:
-        connection = sqlite3.connect(DATABASE_FILE)
-        cursor = connection.cursor()
+        with _read_conn() as connection:
+            cursor = connection.run(_SQL_SELECT_PLAYER, (username,))
 
-        cursor.execute("""
-            SELECT player_id, username, total_score
-            FROM players
-            WHERE username = ?
-        """, (username,))
-
-        result = cursor.fetchone()
-        connection.close()
-
-        if result:
-            return {
-                "player_id": result[0],
-                "username": result[1],
-                "total_score": result[2]
-            }
-        return None
+            return cursor.fetchone()
 
     except Exception as e:
-        print(f"Error getting player by username: {e}")
+        logger.exception("Error getting player by username: %s", e)
         return None
 
 
@@ -203,42 +431,36 @@ def get_player_progress(player_id: str) -> Dict:
     Get player's progress (completed levels).
     Returns dict with level completion status.
     """
-    try:
-        connection = sqlite3.connect(DATABASE_FILE)
-        cursor = connection.cursor()
+    with _progress_lock:
+        cached = _progress_cache.get(player_id)
+        generation = _progress_generation.get(player_id, 0)
+    if cached is not None:
+        return cached
 
-        # Get all levels completed by the player
-        cursor.execute("""
-            SELECT DISTINCT level
-            FROM scores
-            WHERE player_id = ?
-            ORDER BY level
-        """, (player_id,))
-
-        completed_levels = [row[0] for row in cursor.fetchall()]
-        connection.close()
-
-        # Determine next level to play
-        all_levels = ["level_1", "level_2", "level_3", "level_4"]
+    try:
+        with _read_conn() as connection:
+            # Get all levels completed by the player
+            cursor = connection.run(_SQL_SELECT_LEVELS, (player_id,))
 
-        # Find the first incomplete level, or last level if all complete
-        next_level = None
-        for level in all_levels:
-            if level not in completed_levels:
-                next_level = level
-                break
+            completed = {row[0] for row in cursor}
 
-        # If all levels are completed, restart from level_1
-        if next_level is None:
-            next_level = "level_1"
+        # Find the first incomplete level; if all are completed, restart from level_1
+        next_level = next((level for level in _ALL_LEVELS if level not in completed), _ALL_LEVELS[0])
 
-        return {
-            "completed_levels": completed_levels,
+        progress = {
+            "completed_levels": sorted(completed),
             "next_level": next_level
         }
 
+        with _progress_lock:
+            # A save since the read began may have made this result stale
+            if _progress_generation.get(player_id, 0) == generation:
+                _progress_cache[player_id] = progress
+
+        return progress
+
     except Exception as e:
-        print(f"Error getting player progress: {e}")
+        logger.exception("Error getting player progress: %s", e)
         return {
             "completed_levels": [],
             "next_level": "level_1"
@@ -1,13 +1,18 @@
 # Importing libraries
 import os
+import io
+import asyncio
+import time
 import random
+import shutil
 import numpy as np
 from PIL import Image
 from fastapi import FastAPI, Form, Header, UploadFile, File
-from fastapi.responses import JSONResponse, FileResponse
-import shutil
-from app.src.config import get_grid_size, set_grid_size, get_countdown_time, set_countdown_time
+from fastapi.responses import JSONResponse, FileResponse, Response
+from app.src.config import get_grid_size, get_countdown_time
+from app.src.config import update_config as update_game_config
 from fastapi.staticfiles import StaticFiles
+from starlette.formparsers import MultiPartParser
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -15,13 +20,36 @@ from slowapi.errors import RateLimitExceeded
 import json
 from fastapi import Request
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime
 import re
+import string
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from typing import Optional
-import glob
-import time
+from pydantic import BaseModel
+import functools
+import hmac
+import logging
+import aiofiles
+import orjson
+
+# fcntl is POSIX-only; without it question file writes are only serialized within this process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ijson lets the legacy questions.json be split one level at a time; optional
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# simplejpeg hands the ndarray straight to libjpeg-turbo; fall back to Pillow when it isn't installed
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
 
 # Import our modules
 from app.src.database import init_db, register_player, get_winners, get_max_score
@@ -30,11 +58,29 @@ from app.src.sessions import (
     get_or_create_session,
     get_session,
     cleanup_expired_sessions,
-    game_sessions
+    game_sessions,
+    SESSION_TIMEOUT_SECONDS,
 )
 
+# Defaults to WARNING so per-request debug logging stays off in production
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING").upper()
+# getLevelName maps known level names to their number and anything else to a string
+_log_level_valid = isinstance(logging.getLevelName(LOG_LEVEL), int)
+logging.basicConfig(level=LOG_LEVEL if _log_level_valid else logging.WARNING)
+logger = logging.getLogger(__name__)
+if not _log_level_valid:
+    logger.warning("Ignoring invalid LOG_LEVEL %r; using WARNING", LOG_LEVEL)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, which also serializes datetimes and numpy values natively."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
 # Creating API object
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Rate limiting setup
 limiter = Limiter(key_func=get_remote_address)
@@ -50,15 +96,190 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Puzzle source images can be overwritten by /admin/upload, so browsers keep them only
+# briefly and then revalidate against the ETag/Last-Modified that StaticFiles sends
+STATIC_IMAGE_CACHE_CONTROL = "public, max-age=300"
+
+
+class PuzzleStaticFiles(StaticFiles):
+    """StaticFiles that adds Cache-Control to puzzle images under images/ (temp images excluded)."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        parts = path.split(os.sep)
+        if len(parts) > 2 and parts[0] == "images" and parts[1] != "temp" and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = STATIC_IMAGE_CACHE_CONTROL
+        return response
+
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", PuzzleStaticFiles(directory="app/static"), name="static")
+
+# Image metadata lives in one JSON file per level, so an upload rewrites only its level
+QUESTIONS_DIR = "app/data/questions"
+# Single-file layout used before the per-level split; migrated on first start
+LEGACY_QUESTIONS_PATH = "app/data/questions.json"
+
+
+def level_metadata_path(level: str, directory: str = QUESTIONS_DIR) -> str:
+    """Path of the question file for one level."""
+    return os.path.join(directory, f"{level}.json")
+
 
-# Load image metadata from JSON
-with open("app/data/questions.json", "r") as f:
-    image_metadata = json.load(f)
+def _level_sort_key(name: str) -> list:
+    """Natural sort key, so level_10 comes after level_9."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def save_level_metadata(levels: dict, directory: str = QUESTIONS_DIR):
+    """
+    Atomically replace the question files of the given levels. Blocking; run it in a worker thread.
+    Each file is written to a temp path, fsynced and renamed over the original, so a crash
+    or a concurrent reader never sees a partial file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        # Serialize writers across worker processes; released when the file closes
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        for level, images in levels.items():
+            path = level_metadata_path(level, directory)
+            tmp_path = path + ".tmp"
+            # orjson serializes in C into one bytes buffer; no sort so image order is kept
+            payload = orjson.dumps(images, option=orjson.OPT_INDENT_2)
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+
+def _iter_legacy_levels(f):
+    """Yield (level, images) pairs from the legacy questions.json file object."""
+    if ijson is not None:
+        # Stream one level at a time, so only that level is ever held in memory
+        yield from ijson.kvitems(f, "", use_float=True)
+    else:
+        yield from orjson.loads(f.read()).items()
+
+
+def migrate_legacy_questions():
+    """
+    Split the old single questions.json into per-level files, once.
+    All or nothing: levels are written to a staging directory that only becomes
+    QUESTIONS_DIR after every level is written, so a failed split is retried in full.
+    """
+    if os.path.isdir(QUESTIONS_DIR) or not os.path.exists(LEGACY_QUESTIONS_PATH):
+        return
+    staging_dir = QUESTIONS_DIR + ".tmp"
+    # Discard whatever an interrupted earlier attempt left behind
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    migrated = 0
+    with open(LEGACY_QUESTIONS_PATH, "rb") as f:
+        for level, images in _iter_legacy_levels(f):
+            save_level_metadata({level: images}, staging_dir)
+            migrated += 1
+    os.replace(staging_dir, QUESTIONS_DIR)
+    os.replace(LEGACY_QUESTIONS_PATH, LEGACY_QUESTIONS_PATH + ".migrated")
+    logger.info("Split %s into %d level files under %s", LEGACY_QUESTIONS_PATH, migrated, QUESTIONS_DIR)
+
+
+def load_image_metadata() -> dict:
+    """Read every level's question file into one {level: {image: data}} dict, in level order."""
+    migrate_legacy_questions()
+    with os.scandir(QUESTIONS_DIR) as entries:
+        names = sorted((entry.name for entry in entries if entry.name.endswith(".json")), key=_level_sort_key)
+    metadata = {}
+    for name in names:
+        with open(os.path.join(QUESTIONS_DIR, name), "rb") as f:
+            metadata[name[:-len(".json")]] = orjson.loads(f.read())
+    return metadata
+
+
+# Load image metadata from JSON; this in-memory copy is authoritative
+image_metadata = load_image_metadata()
+
+# Level order and position lookup, rebuilt only when a level is added
+LEVELS = tuple(image_metadata.keys())
+LEVEL_INDEX = {lvl: i for i, lvl in enumerate(LEVELS)}
+
+
+def build_answer_key(image_data: dict) -> tuple:
+    """(question, correct answer) pairs for one image, in question order."""
+    return tuple((q["question"], q["answer"]) for q in image_data["questions"])
+
+
+# Answer keys per (level, image), built once instead of on every /check_answers
+ANSWER_KEYS = {
+    (level, image_name): build_answer_key(image_data)
+    for level, images in image_metadata.items()
+    for image_name, image_data in images.items()
+}
+
+
+def refresh_levels():
+    """Rebuild LEVELS and LEVEL_INDEX after image_metadata gains a level."""
+    global LEVELS, LEVEL_INDEX
+    LEVELS = tuple(image_metadata.keys())
+    LEVEL_INDEX = {lvl: i for i, lvl in enumerate(LEVELS)}
+
+
+# Level files are rewritten by a debounced background task rather than on every
+# upload, so a burst of uploads costs a single write per touched level
+METADATA_FLUSH_DELAY_SECONDS = 2.0
+_metadata_dirty = asyncio.Event()
+_dirty_levels = set()  # levels changed since their file was last written
+_metadata_lock = asyncio.Lock()  # one flush at a time within this process
+
+
+def mark_image_metadata_dirty(level: str):
+    """Schedule a level of image_metadata to be written to its question file."""
+    _dirty_levels.add(level)
+    _metadata_dirty.set()
+
+
+async def flush_image_metadata():
+    """Write the question files of levels changed since the last flush."""
+    async with _metadata_lock:
+        if not _dirty_levels:
+            return
+        # Copy the dirty level dicts on the event loop so uploads can't resize them mid-dump
+        snapshot = {level: dict(image_metadata[level]) for level in _dirty_levels}
+        _dirty_levels.clear()
+        try:
+            await asyncio.to_thread(save_level_metadata, snapshot)
+        except BaseException:
+            # Not (known to be) written; leave the levels for the next flush
+            _dirty_levels.update(snapshot)
+            raise
+
+
+async def periodic_metadata_flush():
+    """Flush image_metadata shortly after it changes, coalescing bursts of uploads."""
+    while True:
+        await _metadata_dirty.wait()
+        await asyncio.sleep(METADATA_FLUSH_DELAY_SECONDS)
+        _metadata_dirty.clear()
+        try:
+            await flush_image_metadata()
+        except Exception as e:
+            # The levels stay dirty; keep the task alive and retry on the next cycle
+            logger.exception("Error writing image metadata: %s", e)
+            _metadata_dirty.set()
+
+
+# Valid usernames: at least 3 letters or spaces
+USERNAME_RE = re.compile(r"^[A-Za-z ]{3,}$")
 
 # Admin password from environment variable (default for development only)
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
+_ADMIN_PASSWORD_BYTES = ADMIN_PASSWORD.encode("utf-8")
+
+
+def is_admin_password(password: Optional[str]) -> bool:
+    """Compare against ADMIN_PASSWORD in constant time so timing doesn't leak a matching prefix."""
+    return hmac.compare_digest((password or "").encode("utf-8"), _ADMIN_PASSWORD_BYTES)
 
 
 def cleanup_temp_images(max_age_hours: int = 24):
@@ -73,28 +294,123 @@ def cleanup_temp_images(max_age_hours: int = 24):
         if not os.path.exists(temp_folder):
             return
 
-        current_time = datetime.now()
-
-        # Get all image files in temp folder
-        temp_images = glob.glob(f"{temp_folder}/*.jpg")
+        # Compare raw mtimes against a float cutoff instead of building datetimes per file
+        cutoff = time.time() - max_age_hours * 3600.0
 
+        # Walk the folder lazily instead of materializing a glob match list
         removed_count = 0
-        for image_path in temp_images:
-            # Get file modification time
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(image_path))
-            age = current_time - file_mtime
-
-            # Remove if older than max_age_hours
-            if age > timedelta(hours=max_age_hours):
-                os.remove(image_path)
-                removed_count += 1
-                print(f"Removed old temp image: {image_path}")
+        with os.scandir(temp_folder) as entries:
+            for entry in entries:
+                # Remove if older than max_age_hours
+                if entry.name.endswith(".jpg") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed_count += 1
+                    logger.debug("Removed old temp image: %s", entry.path)
 
         if removed_count > 0:
-            print(f"Cleaned up {removed_count} old temporary images")
+            logger.info("Cleaned up %d old temporary images", removed_count)
 
     except Exception as e:
-        print(f"Error during temp image cleanup: {e}")
+        logger.exception("Error during temp image cleanup: %s", e)
+
+
+@functools.lru_cache(maxsize=64)
+def load_puzzle_image(level: str, image_name: str, grid_size: int):
+    """
+    Load a puzzle image as a grayscale array resized for grid_size, plus its patches.
+    Results are cached and shared between sessions, so both arrays are read-only.
+    """
+    patch_size = 512 // grid_size
+    target_size = patch_size * grid_size # Ensure image is perfectly divisible
+    image_path = f"app/static/images/{level}/{image_name}"
+
+    logger.debug("Opening image: %s", image_path)
+    img = Image.open(image_path)
+    # Let libjpeg decode straight to grayscale at a reduced DCT scale (no-op for PNG)
+    img.draft("L", (target_size, target_size))
+    # Grayscale conversion, then a BILINEAR resize (SIMD-accelerated under Pillow-SIMD).
+    # reducing_gap first shrinks large sources by an integer factor with a cheap box
+    # filter, so the bilinear pass only covers the last < 2x of scaling
+    img = img.convert("L").resize((target_size, target_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    img_array = np.array(img)
+
+    # Divide the image into patches
+    patches = (
+        img_array.reshape(grid_size, patch_size, grid_size, patch_size)
+        .swapaxes(1, 2)
+        .reshape(-1, patch_size, patch_size)
+    )
+
+    img_array.setflags(write=False)
+    patches.setflags(write=False)
+    return img_array, patches
+
+
+TEMP_CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+
+async def periodic_temp_cleanup():
+    """Remove old temporary images every hour, off the request path."""
+    while True:
+        await asyncio.to_thread(cleanup_temp_images, max_age_hours=24)  # Remove temp images older than 24 hours
+        await asyncio.sleep(TEMP_CLEANUP_INTERVAL_SECONDS)
+
+
+# Expired sessions are swept ten times per session lifetime
+SESSION_SWEEP_INTERVAL_SECONDS = SESSION_TIMEOUT_SECONDS / 10
+
+
+async def periodic_session_cleanup():
+    """Drop expired sessions on a timer instead of from request handlers."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        try:
+            cleanup_expired_sessions()
+        except Exception as e:
+            # One failed sweep must not end the task; the next one retries
+            logger.exception("Error during session cleanup: %s", e)
+
+
+# Source of puzzle shuffles
+_rng = np.random.default_rng()
+
+
+def compose_puzzle_image(
+    patches: np.ndarray,
+    positions: np.ndarray,
+    grid_size: int,
+    tile_buffer: Optional[np.ndarray] = None,
+    frame_buffer: Optional[np.ndarray] = None,
+) -> bytes:
+    """
+    Reassemble the patches in the given order and encode the result as a JPEG.
+    tile_buffer, if given, is an array shaped like patches that is reused for the gather;
+    frame_buffer, if given, is a contiguous (target_size, target_size) array reused for the image.
+    Both are overwritten and then encoded from, so callers must not share them between
+    concurrent calls (/shuffled holds the session lock).
+    """
+    patch_size = patches.shape[1]
+    target_size = patch_size * grid_size
+
+    # Gather the tiles in display order, then undo the reshape/swapaxes split
+    # used to cut them: one strided copy in C, no per-tile Python objects.
+    # mode="clip" lets np.take write straight into out (positions are validated in /swap)
+    tiles = np.take(patches, positions, axis=0, out=tile_buffer, mode="clip")
+    if frame_buffer is None:
+        frame_buffer = np.empty((target_size, target_size), dtype=patches.dtype)
+    # Every pixel is written by the copy, so the frame never needs zeroing
+    np.copyto(
+        frame_buffer.reshape(grid_size, patch_size, grid_size, patch_size),
+        tiles.reshape(grid_size, grid_size, patch_size, patch_size).swapaxes(1, 2),
+    )
+    image = frame_buffer
+
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(image[:, :, None], quality=85, colorspace="GRAY")
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
 
 
 # Define the root url
@@ -107,48 +423,47 @@ def serve_html():
 @app.get("/image")
 def get_image(session_id: Optional[str] = Header(None, alias="X-Session-ID")):
     """Serve a random image from the current level and its metadata."""
-    # Cleanup expired sessions and old temp images periodically
-    cleanup_expired_sessions()
-    cleanup_temp_images(max_age_hours=24)  # Remove temp images older than 24 hours
-
     # Get or create session
     session_id = get_or_create_session(session_id)
-    session = game_sessions[session_id]
-    print(f"Session ID for /image: {session_id[:8]}... (total sessions: {len(game_sessions)})")
+    session = get_session(session_id)
+    logger.debug("Session ID for /image: %.8s... (total sessions: %d)", session_id, len(game_sessions))
 
-    current_level = session["current_level"]
+    current_level = session.current_level
 
     if current_level not in image_metadata:
-        return JSONResponse({"error": "Level data not found"}, status_code=404)
+        return ORJSONResponse({"error": "Level data not found"}, status_code=404)
 
     level_data = image_metadata[current_level]
     if not level_data:
-        return JSONResponse({"error": "No images available in the current level"}, status_code=404)
+        return ORJSONResponse({"error": "No images available in the current level"}, status_code=404)
 
     # Select a random image
     image_name = random.choice(list(level_data.keys()))
-    session["current_image_name"] = image_name  # Save selected image name
+    session.current_image_name = image_name  # Save selected image name
 
     # Build file path
     image_path = f"app/static/images/{current_level}/{image_name}"
-    print(f"Attempting to load image from path: {image_path}")  # Debugging output
+    logger.debug("Attempting to load image from path: %s", image_path)
 
     # Check if the image exists
-    if not os.path.exists(image_path):
-        print(f"Image not found: {image_path}")  # Debugging output
-        return JSONResponse({"error": f"Image not found: {image_path}"}, status_code=404)
+    try:
+        image_mtime = os.stat(image_path).st_mtime_ns
+    except FileNotFoundError:
+        logger.warning("Image not found: %s", image_path)
+        return ORJSONResponse({"error": f"Image not found: {image_path}"}, status_code=404)
 
     # Set start time if not already set
-    if session["start_time"] is None:
-        session["start_time"] = datetime.now()
-        print(f"Start time recorded: {session['start_time']}")  # Debugging output
+    if session.start_time is None:
+        session.start_time = datetime.now()
+        logger.debug("Start time recorded: %s", session.start_time)
 
     # Return image metadata
     metadata = level_data[image_name]
-    return JSONResponse({
-        "image_url": f"/static/images/{current_level}/{image_name}",
+    return ORJSONResponse({
+        # Versioned by mtime, so an image replaced by an upload is fetched again right away
+        "image_url": f"/static/images/{current_level}/{image_name}?v={image_mtime}",
         "metadata": metadata,
-        "start_time": session["start_time"].isoformat(),
+        "start_time": session.start_time,
         "session_id": session_id
     })
 
@@ -160,32 +475,39 @@ def get_image(session_id: Optional[str] = Header(None, alias="X-Session-ID")):
 def shuffle_image(session_id: Optional[str] = Header(None, alias="X-Session-ID")):
     """Shuffle the image into a grid."""
     try:
-        print(f"[/shuffle] Received session_id: {session_id[:8] if session_id else 'None'}...")
-        print(f"[/shuffle] Active sessions: {len(game_sessions)}, Session IDs: {[sid[:8] for sid in game_sessions.keys()]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[/shuffle] Received session_id: %.8s...", session_id)
+            logger.debug(
+                "[/shuffle] Active sessions: %d, Session IDs: %s",
+                len(game_sessions), [sid[:8] for sid in game_sessions.keys()],
+            )
 
         # Get or create session (handle server restarts gracefully)
-        if not session_id or session_id not in game_sessions:
-            print(f"WARNING: Invalid/missing session {session_id}, returning error")
-            return JSONResponse({
+        session = get_session(session_id)
+        if session is None:
+            logger.warning("Invalid/missing session %s, returning error", session_id)
+            return ORJSONResponse({
                 "error": "Session expired or invalid. Please refresh the page to start a new game.",
                 "session_expired": True
             }, status_code=400)
 
-        session = game_sessions[session_id]
-        print(f"[/shuffle] Found session, current_level: {session['current_level']}, current_image: {session.get('current_image_name')}")
-        current_level = session["current_level"]
-        current_image_name = session["current_image_name"]
+        logger.debug(
+            "[/shuffle] Found session, current_level: %s, current_image: %s",
+            session.current_level, session.current_image_name,
+        )
+        current_level = session.current_level
+        current_image_name = session.current_image_name
 
         # Validate session state
         if current_image_name is None:
-            return JSONResponse({"error": "No image selected. Please load an image first."}, status_code=400)
+            return ORJSONResponse({"error": "No image selected. Please load an image first."}, status_code=400)
 
         if current_level not in image_metadata:
-            return JSONResponse({"error": "Invalid level"}, status_code=400)
+            return ORJSONResponse({"error": "Invalid level"}, status_code=400)
 
         # Verify the image exists in the current level's metadata
         if current_image_name not in image_metadata[current_level]:
-            return JSONResponse({"error": f"Image {current_image_name} not found in {current_level}"}, status_code=400)
+            return ORJSONResponse({"error": f"Image {current_image_name} not found in {current_level}"}, status_code=400)
 
         # Set patch size dynamically based on config
         grid_size = get_grid_size()
@@ -193,184 +515,153 @@ def shuffle_image(session_id: Optional[str] = Header(None, alias="X-Session-ID")
         target_size = patch_size * grid_size # Ensure image is perfectly divisible
 
         # Debugging output
-        print(f"Level: {current_level}, Grid Size: {grid_size}, PATCH_SIZE: {patch_size}, Target Size: {target_size}")
+        logger.debug(
+            "Level: %s, Grid Size: %d, PATCH_SIZE: %d, Target Size: %d",
+            current_level, grid_size, patch_size, target_size,
+        )
 
         # Ensure a valid image is selected
         if current_image_name is None:
-            return JSONResponse({"error": "No image selected"}, status_code=400)
+            return ORJSONResponse({"error": "No image selected"}, status_code=400)
 
         image_path = f"app/static/images/{current_level}/{current_image_name}"
 
         # Check if the selected image exists
         if not os.path.exists(image_path):
-            print(f"ERROR: Image not found at path: {image_path}")
-            return JSONResponse({"error": "Image not found"}, status_code=404)
-
-        # Open and process the image
-        print(f"Opening image: {image_path}")
-        img = Image.open(image_path).resize((target_size, target_size)).convert("L")  # Grayscale conversion
-        img_array = np.array(img)
-
-        # Divide the image into patches
-        h, w = img_array.shape[:2]
-        # Verify shape matching
-        if h % patch_size != 0 or w % patch_size != 0:
-             # This shouldn't happen if we resized to target_size
-             pass
-
-        patches = (
-            img_array.reshape(h // patch_size, patch_size, -1, patch_size)
-            .swapaxes(1, 2)
-            .reshape(-1, patch_size, patch_size)
-        )
-
-        # Store patches in session
-        session["patches"] = patches.tolist()  # Convert to list for JSON serialization
-        session["original_positions"] = list(range(len(patches)))
-        session["shuffled_positions"] = session["original_positions"].copy()
-
-        # Shuffle the positions
-        random.shuffle(session["shuffled_positions"])
-
-        # Reconstruct the shuffled image
-        shuffled_image = np.zeros_like(img_array)
-        index = 0
-        for i in range(0, h, patch_size):
-            for j in range(0, w, patch_size):
-                shuffled_image[i:i + patch_size, j:j + patch_size] = patches[session["shuffled_positions"][index]]
-                index += 1
-
-        # Ensure temp directory exists
-        temp_dir = "app/static/images/temp"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Save the shuffled image with unique name per session, level, and timestamp in temp folder
-        timestamp = int(time.time() * 1000)
-        shuffled_image_path = f"app/static/images/temp/shuffled_{session_id[:8]}_{current_level}_{timestamp}.jpg"
-
-        print(f"Saving shuffled image to: {shuffled_image_path}")
-        Image.fromarray(shuffled_image).save(shuffled_image_path)
-
-        # Verify file was created
-        if os.path.exists(shuffled_image_path):
-            print(f"✓ Shuffled image created successfully: {shuffled_image_path}")
-        else:
-            print(f"✗ ERROR: Failed to create shuffled image at: {shuffled_image_path}")
-            return JSONResponse({"error": "Failed to create shuffled image"}, status_code=500)
-
-        # Store the current shuffled image path in session
-        session["current_shuffled_image_path"] = shuffled_image_path
-
-        shuffled_url = f"/static/images/temp/shuffled_{session_id[:8]}_{current_level}_{timestamp}.jpg"
-        print(f"Returning shuffled image URL: {shuffled_url}")
-
-        return JSONResponse({
+            logger.error("Image not found at path: %s", image_path)
+            return ORJSONResponse({"error": "Image not found"}, status_code=404)
+
+        # Decoded, resized and split once per (level, image, grid size), then shared
+        _, patches = load_puzzle_image(current_level, current_image_name, grid_size)
+
+        original_positions = np.arange(len(patches), dtype=np.int32)
+
+        # Sessions only reference the shared read-only patches; the composite is
+        # rendered on demand by /shuffled instead of being written to disk.
+        # Swapped in under the lock so a concurrent render never mixes grid sizes
+        with session.lock:
+            session.patches = patches
+            session.tile_buffer = np.empty_like(patches)
+            session.frame_buffer = np.empty((target_size, target_size), dtype=patches.dtype)
+            session.grid_size = grid_size
+            session.original_positions = original_positions
+
+            # Shuffle the positions
+            session.shuffled_positions = _rng.permutation(original_positions)
+            # rev never restarts within a session, so a new puzzle can't reuse an
+            # earlier arrangement's URL and ETag and be served from the browser cache
+            session.rev += 1
+            rev = session.rev
+
+        shuffled_url = f"/shuffled/{session_id}/{rev}"
+        logger.debug("Returning shuffled image URL: %s", shuffled_url)
+
+        return ORJSONResponse({
             "shuffled_image_url": shuffled_url,
             "grid_size": grid_size
         })
 
     except Exception as e:
-        print(f"✗ ERROR in shuffle_image: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse({"error": f"Shuffle failed: {str(e)}"}, status_code=500)
+        logger.exception("Error in shuffle_image: %s", e)
+        return ORJSONResponse({"error": f"Shuffle failed: {str(e)}"}, status_code=500)
+
+
+class SwapRequest(BaseModel):
+    """JSON body for /swap."""
+    index1: int
+    index2: int
 
 
 #####perform swapping
 @app.post("/swap")
 def swap_patches(
-    index1: int = Form(...),
-    index2: int = Form(...),
+    payload: SwapRequest,
     session_id: Optional[str] = Header(None, alias="X-Session-ID")
 ):
     """
     Swap two patches in the shuffled image and return the updated image URL.
     """
+    index1, index2 = payload.index1, payload.index2
     try:
         # Get session
-        if not session_id or session_id not in game_sessions:
-            return JSONResponse({"error": "Invalid session"}, status_code=400)
-
-        session = game_sessions[session_id]
-        shuffled_positions = session.get("shuffled_positions")
-        patches_list = session.get("patches")
-
-        # Ensure valid data exists for swapping
-        if shuffled_positions is None or patches_list is None:
-            return JSONResponse({"error": "No puzzle to swap"}, status_code=400)
-
-        # Convert patches back to numpy array
-        patches = np.array(patches_list)
-
-        # Set patch size dynamically based on config
-        grid_size = get_grid_size()
-        patch_size = 512 // grid_size
-        # Validate indices
-        total_patches = len(shuffled_positions)
-        if index1 < 0 or index2 < 0 or index1 >= total_patches or index2 >= total_patches:
-            return JSONResponse({"error": "Invalid indices"}, status_code=400)
-
-        # Debugging output
-        print(f"Before swap: {shuffled_positions}")
-        print(f"Swapping patches: {index1} <-> {index2}")
-
-        # Swap positions in the shuffled list
-        shuffled_positions[index1], shuffled_positions[index2] = shuffled_positions[index2], shuffled_positions[index1]
-        session["shuffled_positions"] = shuffled_positions
+        session = get_session(session_id)
+        if session is None:
+            return ORJSONResponse({"error": "Invalid session"}, status_code=400)
 
-        # Debugging output
-        print(f"After swap: {shuffled_positions}")
+        # A render may hold the lock for a whole encode; as a sync endpoint this
+        # waits in the threadpool instead of stalling the event loop
+        with session.lock:
+            shuffled_positions = session.shuffled_positions
 
-        # Reconstruct the updated image based on the new shuffled positions
-        target_size = patch_size * grid_size
-        updated_image = np.zeros((target_size, target_size), dtype=np.uint8)  # Grayscale image
+            # Ensure valid data exists for swapping
+            if shuffled_positions is None or session.patches is None:
+                return ORJSONResponse({"error": "No puzzle to swap"}, status_code=400)
 
-        index = 0
-        for i in range(0, target_size, patch_size):
-            for j in range(0, target_size, patch_size):
-                patch = patches[shuffled_positions[index]]
+            # Validate indices
+            total_patches = len(shuffled_positions)
+            if index1 < 0 or index2 < 0 or index1 >= total_patches or index2 >= total_patches:
+                return ORJSONResponse({"error": "Invalid indices"}, status_code=400)
 
-                # Ensure patch size matches the calculated patch size
-                if patch.shape != (patch_size, patch_size):
-                    raise ValueError(
-                        f"Patch at index {index} has invalid dimensions: {patch.shape}. Expected: ({patch_size}, {patch_size})"
-                    )
+            # Debugging output
+            logger.debug("Before swap: %s", shuffled_positions)
+            logger.debug("Swapping patches: %d <-> %d", index1, index2)
 
-                updated_image[i:i + patch_size, j:j + patch_size] = patch
-                index += 1
+            # Swap positions in the shuffled array in place
+            shuffled_positions[[index1, index2]] = shuffled_positions[[index2, index1]]
 
-        # Ensure temp directory exists
-        temp_dir = "app/static/images/temp"
-        os.makedirs(temp_dir, exist_ok=True)
+            # Debugging output
+            logger.debug("After swap: %s", shuffled_positions)
 
-        # Save the updated image with unique name per session, level, and timestamp in temp folder
-        timestamp = int(time.time() * 1000)
-        updated_image_path = f"app/static/images/temp/updated_{session_id[:8]}_{session['current_level']}_{timestamp}.jpg"
+            # Bump the revision so the browser fetches the new arrangement
+            session.rev += 1
+            rev = session.rev
 
-        print(f"Saving updated image to: {updated_image_path}")
-        Image.fromarray(updated_image).save(updated_image_path)
-
-        # Verify file was created
-        if os.path.exists(updated_image_path):
-            print(f"✓ Updated image created successfully")
-        else:
-            print(f"✗ ERROR: Failed to create updated image")
-            return JSONResponse({"error": "Failed to create updated image"}, status_code=500)
+        updated_url = f"/shuffled/{session_id}/{rev}"
+        logger.debug("Returning updated image URL: %s", updated_url)
 
-        # Update session to track the latest image
-        session["current_shuffled_image_path"] = updated_image_path
+        return ORJSONResponse({"updated_image_url": updated_url})
 
-        updated_url = f"/static/images/temp/updated_{session_id[:8]}_{session['current_level']}_{timestamp}.jpg"
-        print(f"Returning updated image URL: {updated_url}")
+    except Exception as e:
+        logger.exception("Error in swap_patches: %s", e)
+        return ORJSONResponse({"error": f"Swap failed: {str(e)}"}, status_code=500)
 
-        return JSONResponse({"updated_image_url": updated_url})
 
-    except Exception as e:
-        print(f"✗ ERROR in swap_patches: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse({"error": f"Swap failed: {str(e)}"}, status_code=500)
 
+# Serve the current puzzle arrangement
+@app.get("/shuffled/{session_id}/{rev}")
+def get_shuffled_image(
+    session_id: str,
+    rev: int,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Render the session's current patch arrangement as a JPEG.
+    The ETag changes with every swap, so a browser holding the current
+    arrangement gets a 304 without anything being re-encoded.
+    """
+    session = get_session(session_id)
+    if session is None:
+        return ORJSONResponse({"error": "No puzzle for this session"}, status_code=404)
+
+    # The render buffers are per session, so concurrent requests take turns with them.
+    # The ETag is read under the same lock, so it always names the arrangement rendered
+    with session.lock:
+        if session.patches is None:
+            return ORJSONResponse({"error": "No puzzle for this session"}, status_code=404)
+
+        etag = f'"{session_id}-{session.rev}"'
+        headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+        if if_none_match == etag:
+            return Response(status_code=304, headers=headers)
+
+        image_bytes = compose_puzzle_image(
+            session.patches,
+            session.shuffled_positions,
+            session.grid_size,
+            session.tile_buffer,
+            session.frame_buffer,
+        )
+    return Response(image_bytes, media_type="image/jpeg", headers=headers)
 
 
 ##### Validating the swapped result
@@ -381,22 +672,22 @@ def validate_puzzle(session_id: Optional[str] = Header(None, alias="X-Session-ID
     Checks if the shuffled_positions match the original_positions.
     """
     # Get session
-    if not session_id or session_id not in game_sessions:
-        return JSONResponse({"error": "Invalid session"}, status_code=400)
+    session = get_session(session_id)
+    if session is None:
+        return ORJSONResponse({"error": "Invalid session"}, status_code=400)
 
-    session = game_sessions[session_id]
-    original_positions = session.get("original_positions")
-    shuffled_positions = session.get("shuffled_positions")
+    original_positions = session.original_positions
+    shuffled_positions = session.shuffled_positions
 
     # Ensure the positions are initialized
     if original_positions is None or shuffled_positions is None:
-        return JSONResponse({"error": "No puzzle to validate"}, status_code=400)
+        return ORJSONResponse({"error": "No puzzle to validate"}, status_code=400)
 
     # Check if the shuffled positions match the original positions
-    is_correct = shuffled_positions == original_positions
+    is_correct = bool(np.array_equal(shuffled_positions, original_positions))
 
     # Return the validation result
-    return JSONResponse({"is_correct": is_correct})
+    return ORJSONResponse({"is_correct": is_correct})
 
 
 # Fetching questions
@@ -404,21 +695,21 @@ def validate_puzzle(session_id: Optional[str] = Header(None, alias="X-Session-ID
 def get_questions(session_id: Optional[str] = Header(None, alias="X-Session-ID")):
     """Serve questions related to the current image."""
     # Get session
-    if not session_id or session_id not in game_sessions:
-        return JSONResponse({"error": "Invalid session"}, status_code=400)
+    session = get_session(session_id)
+    if session is None:
+        return ORJSONResponse({"error": "Invalid session"}, status_code=400)
 
-    session = game_sessions[session_id]
-    current_level = session["current_level"]
-    current_image_name = session["current_image_name"]
+    current_level = session.current_level
+    current_image_name = session.current_image_name
 
     if current_image_name is None or current_level not in image_metadata:
-        return JSONResponse({"error": "No image or level selected"}, status_code=400)
+        return ORJSONResponse({"error": "No image or level selected"}, status_code=400)
 
     # Fetch questions for the current image
     level_data = image_metadata[current_level]
     image_data = level_data.get(current_image_name)
     if not image_data:
-        return JSONResponse({"error": "Image data not found"}, status_code=404)
+        return ORJSONResponse({"error": "Image data not found"}, status_code=404)
 
     # Return the questions
     return {"questions": image_data.get("questions", [])}
@@ -429,58 +720,54 @@ def get_questions(session_id: Optional[str] = Header(None, alias="X-Session-ID")
 async def check_answers(request: Request):
     """Validate the player's answers."""
     # Log the incoming request
-    print("Checking answers...")
+    logger.debug("Checking answers...")
 
     # Get session ID from request
     session_id = request.headers.get("X-Session-ID")
-    if not session_id or session_id not in game_sessions:
-        return JSONResponse({"error": "Invalid session"}, status_code=400)
+    session = get_session(session_id)
+    if session is None:
+        return ORJSONResponse({"error": "Invalid session"}, status_code=400)
 
-    session = game_sessions[session_id]
-    current_level = session["current_level"]
-    current_image_name = session["current_image_name"]
+    current_level = session.current_level
+    current_image_name = session.current_image_name
 
     # Ensure an image is selected
     if current_image_name is None:
-        print("Error: No image selected.")
-        return JSONResponse({"error": "No image selected"}, status_code=400)
+        logger.warning("No image selected.")
+        return ORJSONResponse({"error": "No image selected"}, status_code=400)
 
-    # Get the questions for the current image
-    level_data = image_metadata[current_level]
-    image_data = level_data.get(current_image_name)
-    if not image_data:
-        print("Error: Image data not found.")
-        return JSONResponse({"error": "Image data not found"}, status_code=404)
+    # Get the answer key for the current image
+    answer_key = ANSWER_KEYS.get((current_level, current_image_name))
+    if answer_key is None:
+        logger.warning("Image data not found.")
+        return ORJSONResponse({"error": "Image data not found"}, status_code=404)
 
     # Parse player's answers from the request body
     data = await request.json()
-    print(f"Received data: {data}")
+    logger.debug("Received data: %s", data)
     player_answers = data.get("answers", [])
 
     # Validate answers
-    questions = image_data["questions"]
-    score = 0
+    num_questions = len(answer_key)
     detailed_results = []
 
     for player_answer in player_answers:
         index = player_answer.get("index")
-        answer = player_answer.get("answer")
 
-        if index is not None and index < len(questions):
-            correct_answer = questions[index]["answer"]
-            is_correct = answer == correct_answer
-            if is_correct:
-                score += 1  # Increment score for each correct answer
+        if index is not None and index < num_questions:
+            question, correct_answer = answer_key[index]
+            answer = player_answer.get("answer")
             detailed_results.append({
-                "question": questions[index]["question"],
+                "question": question,
                 "player_answer": answer,
                 "correct_answer": correct_answer,
-                "is_correct": is_correct
+                "is_correct": answer == correct_answer
             })
 
-    print(f"Score: {score}, Detailed Results: {detailed_results}")
+    score = sum(result["is_correct"] for result in detailed_results)
+    logger.debug("Score: %s, Detailed Results: %s", score, detailed_results)
     # Return the result
-    return JSONResponse({"score": score, "total_questions": len(questions), "details": detailed_results})
+    return ORJSONResponse({"score": score, "total_questions": num_questions, "details": detailed_results})
 
 
 
@@ -489,84 +776,114 @@ async def check_answers(request: Request):
 def next_level(session_id: Optional[str] = Header(None, alias="X-Session-ID")):
     """Progress to the next level."""
     # Get session
-    if not session_id or session_id not in game_sessions:
-        return JSONResponse({"error": "Invalid session"}, status_code=400)
+    session = get_session(session_id)
+    if session is None:
+        return ORJSONResponse({"error": "Invalid session"}, status_code=400)
 
-    session = game_sessions[session_id]
-    current_level = session["current_level"]
+    current_level = session.current_level
 
-    levels = list(image_metadata.keys())
-    current_index = levels.index(current_level) if current_level in levels else -1
+    current_index = LEVEL_INDEX.get(current_level, -1)
 
-    if current_index < len(levels) - 1:
-        session["current_level"] = levels[current_index + 1]
-        session["current_image_name"] = None  # Reset current image for the new level
+    if current_index + 1 < len(LEVELS):
+        session.current_level = LEVELS[current_index + 1]
 
-        # Clear all puzzle state to prevent stale data
-        session["patches"] = None
-        session["shuffled_positions"] = None
-        session["original_positions"] = None
-        session["start_time"] = None
-        session["current_shuffled_image_path"] = None
+        # Clear the current image and all puzzle state to prevent stale data
+        session.clear_puzzle()
 
-        return JSONResponse({"message": "Progressed to the next level", "level": session["current_level"]})
+        return ORJSONResponse({"message": "Progressed to the next level", "level": session.current_level})
     else:
-        return JSONResponse({"message": "You have completed all levels!", "level": None})
+        return ORJSONResponse({"message": "You have completed all levels!", "level": None})
     
     
 
 @app.on_event("startup")
 def ensure_directories():
-    """Ensure required directories exist at startup."""
+    """Ensure required directories exist and the database is initialized at startup."""
+    # Create tables and indexes; init_db is a no-op after the first call
+    init_db()
+
     # Ensure temp images directory exists
     temp_dir = "app/static/images/temp"
     os.makedirs(temp_dir, exist_ok=True)
 
+    # Create every level's image directory once, up front
+    for level in image_metadata:
+        ensure_level_dir(level)
+
+    # Pre-decode every puzzle image for the current grid size so the first
+    # /shuffle of each image doesn't pay for it
+    grid_size = get_grid_size()
+    for level, images in image_metadata.items():
+        for image_name in images:
+            try:
+                load_puzzle_image(level, image_name, grid_size)
+            except OSError as e:
+                logger.warning("Could not preload %s/%s: %s", level, image_name, e)
+
     # Ensure player_data.json file exists (legacy support)
     player_data_path = "app/data/player_data.json"
     if not os.path.exists(player_data_path):
         with open(player_data_path, "w") as f:
             json.dump({"players": []}, f, indent=4)
-        print("player_data.json file created.")
+        logger.info("player_data.json file created.")
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start the periodic temp image and session cleanups and the question file flusher."""
+    app.state.temp_cleanup_task = asyncio.create_task(periodic_temp_cleanup())
+    app.state.session_cleanup_task = asyncio.create_task(periodic_session_cleanup())
+    app.state.metadata_flush_task = asyncio.create_task(periodic_metadata_flush())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Cancel background tasks started at startup and write any pending metadata."""
+    app.state.temp_cleanup_task.cancel()
+    app.state.session_cleanup_task.cancel()
+    app.state.metadata_flush_task.cancel()
+    await flush_image_metadata()
+
+
+# Define weights for each level
+LEVEL_WEIGHTS = {
+    "level_1": {"weight": 10, "num_questions": 3},  # 10% weight, 3 questions
+    "level_2": {"weight": 20, "num_questions": 3},  # 20% weight, 3 questions
+    "level_3": {"weight": 30, "num_questions": 3},  # 30% weight, 3 questions
+    "level_4": {"weight": 40, "num_questions": 5},  # 40% weight, 5 questions
+}
+
+
+class SaveScoreRequest(BaseModel):
+    """JSON body for /save_score."""
+    player_id: str
+    level: str
+    score: float
 
 
 # Scoring
 @app.post("/save_score")
 @limiter.limit("10/minute")
-async def save_score(request: Request):
+async def save_score(request: Request, payload: SaveScoreRequest):
     """Save the player's score for the current level with a timestamp."""
     # Get session ID from request
     session_id = request.headers.get("X-Session-ID")
-    if session_id and session_id in game_sessions:
-        session = game_sessions[session_id]
-        start_time = session.get("start_time")
-    else:
-        start_time = None
+    session = get_session(session_id)
+    start_time = session.start_time if session is not None else None
 
-    data = await request.json()
-    print("Received data at /save_score:", data)  # Log received data
-
-    player_id = data.get("player_id")
-    level = data.get("level")
-    score = data.get("score")
+    player_id = payload.player_id
+    level = payload.level
+    score = payload.score
 
-    print(f"Player ID: {player_id}, Level: {level}, Score: {score}")  # Detailed log
+    logger.debug("Player ID: %s, Level: %s, Score: %s", player_id, level, score)
 
-    if not player_id or not level or score is None:
-        return JSONResponse({"error": "Invalid data"}, status_code=400)
-
-    # Define weights for each level
-    label_weights = {
-        "level_1": {"weight": 10, "num_questions": 3},  # 10% weight, 3 questions
-        "level_2": {"weight": 20, "num_questions": 3},  # 20% weight, 3 questions
-        "level_3": {"weight": 30, "num_questions": 3},  # 30% weight, 3 questions
-        "level_4": {"weight": 40, "num_questions": 5},  # 40% weight, 5 questions
-    }
+    if not player_id or not level:
+        return ORJSONResponse({"error": "Invalid data"}, status_code=400)
 
     # Calculate weighted score for the given level
-    level_data = label_weights.get(level)
+    level_data = LEVEL_WEIGHTS.get(level)
     if not level_data:
-        return JSONResponse({"error": f"Invalid level: {level}"}, status_code=400)
+        return ORJSONResponse({"error": f"Invalid level: {level}"}, status_code=400)
 
     weight_per_question = level_data["weight"] / level_data["num_questions"]
     weighted_score = score * weight_per_question  # Scale the score by the weight per question
@@ -575,33 +892,27 @@ async def save_score(request: Request):
     success, total_score, error = db_save_score(player_id, level, weighted_score)
 
     if not success:
-        return JSONResponse({"error": f"Failed to save score: {error}"}, status_code=500)
+        return ORJSONResponse({"error": f"Failed to save score: {error}"}, status_code=500)
 
-    return JSONResponse({
+    return ORJSONResponse({
         "message": "Score saved",
         "total_score": total_score,
         "weighted_score": round(weighted_score, 2),
-        "timestamp": datetime.now().isoformat(),
-        "start_time": start_time.isoformat() if start_time else "Not available"
+        "timestamp": datetime.now(),
+        "start_time": start_time or "Not available"
     })
 
-####DATABASE###
-# Database initialization at startup
-init_db()
-
 
 ### Registering Users
 @app.post("/register")
 @limiter.limit("5/minute")
 def register_player_endpoint(request: Request, username: str = Form(...)):
     """Register a new player or resume existing player's game."""
-    # Validate input - strip whitespace and check length
+    # Validate input - at least 3 characters, letters and spaces only
     username = username.strip()
-    if not username or len(username) < 3:
-        return {"error": "Username must be at least 3 characters long"}
-
-    # Ensure username contains only letters and spaces
-    if not re.match("^[a-zA-Z ]+$", username):
+    if not USERNAME_RE.match(username):
+        if len(username) < 3:
+            return {"error": "Username must be at least 3 characters long"}
         return {"error": "Username must contain only letters (a-z, A-Z)"}
 
     # Check if player already exists
@@ -667,7 +978,7 @@ WINNER_DATA_PATH = "app/data/winners.json"
 def select_winner():
     """Calculate and save the winner based on total scores and timestamps."""
     if not os.path.exists(PLAYER_DATA_PATH):
-        print("No player data found.")
+        logger.info("No player data found.")
         return
 
     with open(PLAYER_DATA_PATH, "r") as f:
@@ -676,7 +987,7 @@ def select_winner():
     players = player_data.get("players", [])
 
     if not players:
-        print("No players found.")
+        logger.info("No players found.")
         return
     
     # Calculate total time taken for each player and find the highest score
@@ -717,13 +1028,13 @@ def select_winner():
     with open(WINNER_DATA_PATH, "w") as f:
         json.dump({"winners": winners, "max_score": max_score}, f, indent=4)
 
-    print(f"Winners selected: {winners}")        
+    logger.info("Winners selected: %s", winners)
 
 @app.get("/get_winners")
 def get_winners():
     """Retrieve all winners with the highest total score."""
     if not os.path.exists(WINNER_DATA_PATH):
-        return JSONResponse({"error": "Winner data not found."}, status_code=404)
+        return ORJSONResponse({"error": "Winner data not found."}, status_code=404)
 
     with open(WINNER_DATA_PATH, "r") as f:
         winner_data = json.load(f)
@@ -738,16 +1049,16 @@ def get_winners():
 def manual_select_winner(request: Request, password: str = Form(...)):
     """Manually trigger the winner selection process (requires authentication)."""
     # Check password
-    if password != ADMIN_PASSWORD:
-        return JSONResponse({"error": "Unauthorized - Invalid password"}, status_code=401)
+    if not is_admin_password(password):
+        return ORJSONResponse({"error": "Unauthorized - Invalid password"}, status_code=401)
 
     # Get winners from database
     winners = get_winners()
 
     if not winners:
-        return JSONResponse({"error": "No players found"}, status_code=404)
+        return ORJSONResponse({"error": "No players found"}, status_code=404)
 
-    return JSONResponse({
+    return ORJSONResponse({
         "message": "Winner selection completed",
         "winners": winners,
         "max_score": get_max_score()
@@ -760,61 +1071,133 @@ def update_config(
     password: str = Form(...)
 ):
     """Update the game configuration."""
-    if password != ADMIN_PASSWORD:
-        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    if not is_admin_password(password):
+        return ORJSONResponse({"error": "Unauthorized"}, status_code=401)
     
     messages = []
+    updates = {}
     
     if grid_size is not None:
         if grid_size < 2 or grid_size > 10:
-             return JSONResponse({"error": "Grid size must be between 2 and 10"}, status_code=400)
-        set_grid_size(grid_size)
+             return ORJSONResponse({"error": "Grid size must be between 2 and 10"}, status_code=400)
+        updates["grid_size"] = grid_size
         messages.append(f"Grid size updated to {grid_size}x{grid_size}")
 
     if countdown_time is not None:
         if countdown_time < 0 or countdown_time > 60:
-            return JSONResponse({"error": "Countdown time must be between 0 and 60 seconds"}, status_code=400)
-        set_countdown_time(countdown_time)
+            return ORJSONResponse({"error": "Countdown time must be between 0 and 60 seconds"}, status_code=400)
+        updates["countdown_time"] = countdown_time
         messages.append(f"Countdown time updated to {countdown_time}s")
 
-    return JSONResponse({"message": ", ".join(messages)})
+    # Write both settings in one read-modify-write of config.json
+    if updates:
+        update_game_config(**updates)
+
+    return ORJSONResponse({"message": ", ".join(messages)})
+
+# Read size when streaming uploads to disk; clamped to at least Starlette's 1 MiB spool
+# size, so an in-memory upload is drained in a single read (and 0 can't end it early)
+UPLOAD_CHUNK_SIZE_DEFAULT = 2 * 1024 * 1024
+try:
+    UPLOAD_CHUNK_SIZE = max(1024 * 1024, int(os.environ.get("UPLOAD_CHUNK_SIZE", UPLOAD_CHUNK_SIZE_DEFAULT)))
+except ValueError:
+    logger.warning(
+        "Ignoring invalid UPLOAD_CHUNK_SIZE %r; using %d", os.environ["UPLOAD_CHUNK_SIZE"], UPLOAD_CHUNK_SIZE_DEFAULT
+    )
+    UPLOAD_CHUNK_SIZE = UPLOAD_CHUNK_SIZE_DEFAULT
+# Bytes handed to each os.sendfile call when the upload spool is already on disk
+UPLOAD_SENDFILE_CHUNK = 16 * 1024 * 1024
+
+
+class _SafeNameTable(dict):
+    """str.translate table that keeps [A-Za-z0-9._-] and maps every other code point to "_"."""
+
+    def __missing__(self, codepoint):
+        return "_"
+
+
+_SAFE_NAME_TABLE = _SafeNameTable({ord(c): c for c in string.ascii_letters + string.digits + "._-"})
+
+
+def safe_name(name: Optional[str]) -> str:
+    """Reduce a client-supplied name to a single safe path component ("" if nothing usable is left)."""
+    name = os.path.basename((name or "").replace("\\", "/")).translate(_SAFE_NAME_TABLE)
+    return "" if name.strip(".") == "" else name
+
+
+# Level image directories already known to exist, so uploads skip the makedirs syscalls
+_known_level_dirs = set()
+
+
+def ensure_level_dir(level: str):
+    """Create app/static/images/<level> the first time the level is seen in this process."""
+    if level not in _known_level_dirs:
+        os.makedirs(f"app/static/images/{level}", exist_ok=True)
+        _known_level_dirs.add(level)
+
+
+def sendfile_upload(src_fd: int, file_location: str):
+    """Copy an on-disk upload to file_location inside the kernel. Blocking; run it in a worker thread."""
+    with open(file_location, "wb") as buffer:
+        offset = 0
+        while sent := os.sendfile(buffer.fileno(), src_fd, offset, UPLOAD_SENDFILE_CHUNK):
+            offset += sent
+
+
+async def save_upload(file: UploadFile, file_location: str):
+    """Write an uploaded file to file_location without blocking the event loop."""
+    # Once the spool has rolled over to a real temp file, skip the user-space copy.
+    # Starlette's spool rolls to disk once it grows past spool_max_size; checking the
+    # size first matters, since fileno() on an in-memory spool would force a rollover.
+    if hasattr(os, "sendfile") and (file.size or 0) > MultiPartParser.spool_max_size:
+        try:
+            await asyncio.to_thread(sendfile_upload, file.file.fileno(), file_location)
+            return
+        except (AttributeError, io.UnsupportedOperation, OSError) as e:
+            logger.debug("sendfile unavailable for upload, streaming instead: %s", e)
+
+    async with aiofiles.open(file_location, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await buffer.write(chunk)
+
 
 @app.post("/admin/upload")
-def upload_image(
+async def upload_image(
     file: UploadFile = File(...), 
     level: str = Form(...), 
     password: str = Form(...)
 ):
     """Upload a new image to a specific level."""
-    if password != ADMIN_PASSWORD:
-        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    if not is_admin_password(password):
+        return ORJSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    if level not in image_metadata:
-        # Create level if it doesn't exist in metadata, but for now strict to existing structure or just allow appending
-        # For simplicity, if level implies a new key in json, we should handle it. 
-        # But user asked to add to level.
-        # Let's ensure directory exists first.
-        pass
+    # Both end up in filesystem paths: reject odd level names, sanitize the filename
+    if not level or safe_name(level) != level:
+        return ORJSONResponse({"error": "Invalid level name"}, status_code=400)
+    filename = safe_name(file.filename)
+    if not filename:
+        return ORJSONResponse({"error": "Invalid file name"}, status_code=400)
 
     # Save the file
-    file_location = f"app/static/images/{level}/{file.filename}"
-    os.makedirs(os.path.dirname(file_location), exist_ok=True)
+    file_location = f"app/static/images/{level}/{filename}"
+    ensure_level_dir(level)
     
     try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await save_upload(file, file_location)
     except Exception as e:
-        return JSONResponse({"error": f"Failed to save file: {str(e)}"}, status_code=500)
+        return ORJSONResponse({"error": f"Failed to save file: {str(e)}"}, status_code=500)
 
-    # Update questions.json (image_metadata)
-    # Reload metadata to ensure we have latest (though in this simple app it's in-memory)
-    # We need to update the in-memory variable `image_metadata` AND the file `app/data/questions.json`
+    # Drop cached arrays in case an existing image was overwritten
+    load_puzzle_image.cache_clear()
+
+    # Update image_metadata; the level's question file is written by the background flusher
     
     if level not in image_metadata:
         image_metadata[level] = {}
+        refresh_levels()
 
     # Check if image already exists in metadata
-    if file.filename not in image_metadata[level]:
+    if filename not in image_metadata[level]:
         # Add default placeholder data
         default_data = {
             "organ": "Unknown",
@@ -827,84 +1210,100 @@ def upload_image(
                 }
             ]
         }
-        image_metadata[level][file.filename] = default_data
+        image_metadata[level][filename] = default_data
+        ANSWER_KEYS[(level, filename)] = build_answer_key(default_data)
         
-        # Save back to JSON file
-        with open("app/data/questions.json", "w") as f:
-            json.dump(image_metadata, f, indent=4)
+        mark_image_metadata_dirty(level)
             
-    return JSONResponse({"message": f"Image {file.filename} uploaded to {level} successfully."})
+    return ORJSONResponse({"message": f"Image {filename} uploaded to {level} successfully."})
 # Initialize Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
 
+# Rendered admin page and the template mtime it was rendered at; the page has no
+# per-request context, so it is re-rendered only when the template file changes
+ADMIN_TEMPLATE_PATH = "app/templates/admin.html"
+_admin_page_cache = None
+
+
+def render_admin_page() -> bytes:
+    """Return the rendered admin page, rendering it again only if admin.html changed."""
+    global _admin_page_cache
+    mtime = os.stat(ADMIN_TEMPLATE_PATH).st_mtime_ns
+    if _admin_page_cache is None or _admin_page_cache[0] != mtime:
+        body = templates.get_template("admin.html").render().encode("utf-8")
+        _admin_page_cache = (mtime, body)
+    return _admin_page_cache[1]
+
+
+# Login form served to unauthenticated /admin requests, encoded once at import
+ADMIN_LOGIN_HTML = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Admin Login</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            height: 100vh;
+            margin: 0;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        }
+        .login-box {
+            background: white;
+            padding: 40px;
+            border-radius: 10px;
+            box-shadow: 0 10px 25px rgba(0,0,0,0.2);
+            text-align: center;
+        }
+        input {
+            padding: 10px;
+            margin: 10px 0;
+            width: 250px;
+            border: 1px solid #ddd;
+            border-radius: 5px;
+        }
+        button {
+            padding: 10px 30px;
+            background: #667eea;
+            color: white;
+            border: none;
+            border-radius: 5px;
+            cursor: pointer;
+            font-size: 16px;
+        }
+        button:hover {
+            background: #764ba2;
+        }
+        h1 { color: #333; }
+    </style>
+</head>
+<body>
+    <div class="login-box">
+        <h1>Admin Login</h1>
+        <form method="get" action="/admin">
+            <input type="password" name="password" placeholder="Enter admin password" required>
+            <br>
+            <button type="submit">Login</button>
+        </form>
+    </div>
+</body>
+</html>
+""".encode("utf-8")
+
+
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_page(request: Request, password: Optional[str] = None):
     """
     Serve the admin panel page to manage winner selection (requires authentication).
     """
     # Simple authentication check
-    if password != ADMIN_PASSWORD:
-        return HTMLResponse(
-            content="""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Admin Login</title>
-                <style>
-                    body {
-                        font-family: Arial, sans-serif;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        height: 100vh;
-                        margin: 0;
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    }
-                    .login-box {
-                        background: white;
-                        padding: 40px;
-                        border-radius: 10px;
-                        box-shadow: 0 10px 25px rgba(0,0,0,0.2);
-                        text-align: center;
-                    }
-                    input {
-                        padding: 10px;
-                        margin: 10px 0;
-                        width: 250px;
-                        border: 1px solid #ddd;
-                        border-radius: 5px;
-                    }
-                    button {
-                        padding: 10px 30px;
-                        background: #667eea;
-                        color: white;
-                        border: none;
-                        border-radius: 5px;
-                        cursor: pointer;
-                        font-size: 16px;
-                    }
-                    button:hover {
-                        background: #764ba2;
-                    }
-                    h1 { color: #333; }
-                </style>
-            </head>
-            <body>
-                <div class="login-box">
-                    <h1>Admin Login</h1>
-                    <form method="get" action="/admin">
-                        <input type="password" name="password" placeholder="Enter admin password" required>
-                        <br>
-                        <button type="submit">Login</button>
-                    </form>
-                </div>
-            </body>
-            </html>
-            """,
-            status_code=401
-        )
+    if not is_admin_password(password):
+        return Response(content=ADMIN_LOGIN_HTML, status_code=401, media_type="text/html")
 
-    return templates.TemplateResponse("admin.html", {"request": request, "password": password})
+    return Response(content=render_admin_page(), media_type="text/html")
 
 
 
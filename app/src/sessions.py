@@ -1,15 +1,59 @@
 """
 Session management for the eHealth Puzzle Game
 """
-import uuid
-from datetime import datetime, timedelta
-from typing import Optional, Dict
+import logging
+import secrets
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
 
-# Session storage
-game_sessions: Dict[str, Dict] = {}
-session_timeouts: Dict[str, datetime] = {}
+import numpy as np
+from cachetools import TTLCache
 
-SESSION_TIMEOUT_MINUTES = 60
+
+@dataclass(slots=True)
+class SessionState:
+    """
+    Puzzle state for one player.
+    Positions are int32 arrays; patches is the shared read-only array from the image cache.
+    lock guards the puzzle fields and the render buffers, which sync endpoints in the
+    threadpool would otherwise read and overwrite concurrently.
+    """
+    current_level: str = "level_1"
+    current_image_name: Optional[str] = None
+    start_time: Optional[datetime] = None
+    original_positions: Optional[np.ndarray] = None
+    shuffled_positions: Optional[np.ndarray] = None
+    patches: Optional[np.ndarray] = None
+    tile_buffer: Optional[np.ndarray] = None
+    frame_buffer: Optional[np.ndarray] = None
+    grid_size: Optional[int] = None
+    rev: int = 0  # bumped on every shuffle and swap; names the current arrangement
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def clear_puzzle(self):
+        """Drop the current puzzle so no stale state carries over to the next level."""
+        with self.lock:
+            self.current_image_name = None
+            self.start_time = None
+            self.original_positions = None
+            self.shuffled_positions = None
+            self.patches = None
+            self.tile_buffer = None
+            self.frame_buffer = None
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_TIMEOUT_SECONDS = 60 * 60
+MAX_SESSIONS = 10000
+
+# Session storage, bounded by both size (least recently used evicted first) and
+# age (time.monotonic() deadlines); TTLCache tracks both in one structure
+game_sessions: "TTLCache[str, SessionState]" = TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TIMEOUT_SECONDS)
+# TTLCache reorders itself on every read, and sync endpoints run in a threadpool
+_sessions_lock = threading.Lock()
 
 
 def get_or_create_session(session_id: Optional[str] = None) -> str:
@@ -17,44 +61,41 @@ def get_or_create_session(session_id: Optional[str] = None) -> str:
     Get existing session or create a new one.
     Returns the session ID.
     """
-    if session_id and session_id in game_sessions:
-        # Update timeout
-        session_timeouts[session_id] = datetime.now() + timedelta(minutes=SESSION_TIMEOUT_MINUTES)
-        return session_id
-
-    # Create new session
-    new_session_id = str(uuid.uuid4())
-    game_sessions[new_session_id] = {
-        "original_positions": None,
-        "shuffled_positions": None,
-        "patches": None,
-        "current_level": "level_1",
-        "current_image_name": None,
-        "start_time": None
-    }
-    session_timeouts[new_session_id] = datetime.now() + timedelta(minutes=SESSION_TIMEOUT_MINUTES)
-    return new_session_id
-
-
-def get_session(session_id: str) -> Optional[Dict]:
-    """Get a session by ID."""
-    return game_sessions.get(session_id)
+    with _sessions_lock:
+        session = game_sessions.get(session_id) if session_id else None
+        if session is not None:
+            # Re-inserting restarts the session's TTL
+            game_sessions[session_id] = session
+            return session_id
+
+        # Create new session; past MAX_SESSIONS the least recently used one is evicted
+        # 128 random bits as a 22-character URL-safe id
+        new_session_id = secrets.token_urlsafe(16)
+        game_sessions[new_session_id] = SessionState()
+        return new_session_id
+
+
+def get_session(session_id: Optional[str]) -> Optional[SessionState]:
+    """Get a session by ID, marking it most recently used."""
+    if not session_id:
+        return None
+    with _sessions_lock:
+        return game_sessions.get(session_id)
 
 
 def cleanup_expired_sessions():
     """Remove expired sessions to free memory."""
-    now = datetime.now()
-    expired = [sid for sid, timeout in session_timeouts.items() if timeout < now]
-
-    for sid in expired:
-        game_sessions.pop(sid, None)
-        session_timeouts.pop(sid, None)
+    # TTLCache already drops expired sessions as new ones are added; this only
+    # releases them sooner when no sessions are being created
+    with _sessions_lock:
+        # expire() returns the removed items from cachetools 5.3 on (pinned in requirements.txt)
+        expired = len(game_sessions.expire())
 
     if expired:
-        print(f"Cleaned up {len(expired)} expired sessions")
+        logger.debug("Cleaned up %d expired sessions", expired)
 
 
 def clear_session(session_id: str):
     """Clear a specific session."""
-    game_sessions.pop(session_id, None)
-    session_timeouts.pop(session_id, None)
+    with _sessions_lock:
+        game_sessions.pop(session_id, None)
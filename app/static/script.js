@@ -304,7 +304,7 @@ async function shuffleImage() {
         if (response.ok) {
             console.log("Shuffle successful, loading image:", data.shuffled_image_url);
             const img = document.getElementById("puzzle-image");
-            img.src = data.shuffled_image_url + "?t=" + new Date().getTime();
+            img.src = data.shuffled_image_url;
             currentGridSize = data.grid_size || 4;
 
             document.getElementById("validate-button").classList.remove("hidden");
@@ -361,18 +361,15 @@ function handleImageClick(e) {
 async function performSwap(idx1, idx2) {
     if (idx1 === idx2) return;
 
-    const formData = new FormData();
-    formData.append("index1", idx1);
-    formData.append("index2", idx2);
-
     const { response, data } = await fetchWithSession('/swap', {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ index1: idx1, index2: idx2 })
     });
 
     if (response.ok) {
         const img = document.getElementById("puzzle-image");
-        img.src = data.updated_image_url + "?t=" + new Date().getTime();
+        img.src = data.updated_image_url;
     }
 }
 